@@ -0,0 +1,39 @@
+import os
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv
+
+
+def write_csv(df, filepath):
+    """Write a DataFrame to CSV with the multithreaded Arrow writer.
+
+    Arrow quotes every string field and writes booleans as true/false;
+    pd.read_csv reads the files back unchanged.
+    """
+
+    csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), filepath)
+
+
+def parquet_path(csv_path):
+    """Path of the Parquet copy kept next to a CSV output."""
+
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+
+def write_parquet(df, csv_path):
+    """Write a zstd-compressed Parquet copy next to a CSV output."""
+
+    df.to_parquet(parquet_path(csv_path), index=False, compression='zstd')
+
+
+def read_table(csv_path):
+    """Read a CSV output, preferring its Parquet copy when that is at least as new."""
+
+    cached_path = parquet_path(csv_path)
+    if os.path.exists(cached_path) and (
+            not os.path.exists(csv_path) or os.path.getmtime(cached_path) >= os.path.getmtime(csv_path)):
+        print(f"  Reading {cached_path}")
+        return pd.read_parquet(cached_path)
+
+    print(f"  Reading {csv_path}")
+    return pd.read_csv(csv_path, engine='pyarrow')
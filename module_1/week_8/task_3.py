@@ -1,13 +1,26 @@
 import pandas as pd
 import numpy as np
+from pyarrow import csv
+
+try:
+    from .table_io import write_csv, write_parquet
+except ImportError:
+    # Run as a plain script (python path/to/task_3.py): import the sibling module directly
+    from table_io import write_csv, write_parquet
 
 
 def main():
     """Main function to prepare census dwelling data for Land Registry matching."""
 
     # Load the data files
-    lookup_df = pd.read_csv('module_1/week_8/Local_Authority_District_to_Region_(December_2023)_Lookup_in_England.csv')
-    census_df = pd.read_csv('module_1/week_8/RM205-2021-2.csv')
+    lookup_df = pd.read_csv(
+        'module_1/week_8/Local_Authority_District_to_Region_(December_2023)_Lookup_in_England.csv',
+        engine='pyarrow'
+    )
+    census_df = csv.read_csv(
+        'module_1/week_8/RM205-2021-2.csv',
+        read_options=csv.ReadOptions(block_size=64 << 20, use_threads=True)
+    ).to_pandas()
 
     # Display initial data structure
     print("=== Census Data Structure ===")
@@ -16,26 +29,27 @@ def main():
     print(f"\nColumns: {census_df.columns.tolist()}")
 
     # Clean column names (remove extra spaces)
-    census_df.columns = census_df.columns.str.strip()
-    lookup_df.columns = lookup_df.columns.str.strip()
+    census_df.rename(columns=str.strip, inplace=True)
+    lookup_df.rename(columns=str.strip, inplace=True)
 
 
     # Pivot the census data to wide format
-    census_wide = census_df.pivot(
-        index=['Lower tier local authorities Code', 'Lower tier local authorities'],
-        columns='Number of household spaces in shared dwellings (3 categories)',
-        values='Observation'
-    ).reset_index()
-
-    # Rename columns for clarity
+    census_wide = census_df.groupby(
+        ['Lower tier local authorities Code', 'Lower tier local authorities',
+         'Number of household spaces in shared dwellings (3 categories)'],
+        sort=False,
+        observed=True
+    )['Observation'].sum().unstack(fill_value=0)
+
+    # Rename columns for clarity (by label, so the category order does not matter)
+    census_wide = census_wide.reset_index().rename(columns={
+        'Lower tier local authorities Code': 'LAD_Code',
+        'Lower tier local authorities': 'LAD_Name',
+        'Shared dwelling: Two household spaces': 'Shared_Two_Spaces',
+        'Shared dwelling: Three or more household spaces': 'Shared_Three_Plus_Spaces',
+        'Unshared dwelling': 'Unshared_Dwelling'
+    })
     census_wide.columns.name = None
-    census_wide.columns = [
-        'LAD_Code',
-        'LAD_Name',
-        'Shared_Two_Spaces',
-        'Shared_Three_Plus_Spaces',
-        'Unshared_Dwelling'
-    ]
 
     # Calculate total dwellings and dwelling type aggregations
     census_wide['Total_Dwellings'] = (
@@ -93,22 +107,23 @@ def main():
 
     # Save to CSV
     output_file = 'module_1/week_8/census_dwelling_data_prepared.csv'
-    final_df.to_csv(output_file, index=False)
+    write_csv(final_df, output_file)
     print(f"\n✓ Data saved to: {output_file}")
 
     # Regional aggregation (optional)
-    regional_summary = final_df.groupby(['Region_Code', 'Region_Name']).agg({
-        'Unshared_Dwellings': 'sum',
-        'Shared_Dwellings': 'sum',
-        'Total_Dwellings': 'sum'
-    }).reset_index()
+    regional_summary = final_df.groupby(['Region_Code', 'Region_Name'], observed=True, as_index=False)[[
+        'Unshared_Dwellings',
+        'Shared_Dwellings',
+        'Total_Dwellings'
+    ]].sum()
 
     print("\n=== Regional Summary ===")
     print(regional_summary)
 
     # Save regional summary
     regional_output = 'module_1/week_8/census_dwelling_regional_summary.csv'
-    regional_summary.to_csv(regional_output, index=False)
+    write_csv(regional_summary, regional_output)
+    write_parquet(regional_summary, regional_output)
     print(f"\n✓ Regional summary saved to: {regional_output}")
 
 # Entry point check
@@ -3,12 +3,61 @@ import numpy as np
 from datetime import datetime
 import warnings
 import openpyxl
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from pyarrow import csv
+
+try:
+    from .table_io import write_csv, write_parquet
+except ImportError:
+    # Run as a plain script (python path/to/task_4.py): import the sibling module directly
+    from table_io import write_csv, write_parquet
 
 warnings.filterwarnings('ignore')
 
+# Land Registry monthly files store transfer dates as 'YYYY-MM-DD HH:MM'
+DATE_FORMAT = '%Y-%m-%d %H:%M'
+
+# Rows per streamed batch when scanning the property file
+BATCH_SIZE = 500_000
+
+
+def write_excel_sheets(filepath, sheets):
+    """Write DataFrames to one workbook, streaming rows with xlsxwriter's constant_memory mode."""
+
+    try:
+        import xlsxwriter
+
+        # constant_memory flushes each row once written, so rows must go out in order;
+        # DataFrame.to_excel writes column by column and would lose data in this mode
+        workbook = xlsxwriter.Workbook(filepath, {'constant_memory': True})
+
+        for sheet_name, df in sheets.items():
+            ws = workbook.add_worksheet(sheet_name)
+            ws.write_row(0, 0, df.columns.tolist())
+
+            # Missing values become blank cells, as DataFrame.to_excel writes them
+            column_values = [df[col].astype(object).where(df[col].notna(), None).tolist() for col in df.columns]
+            for row_idx, row in enumerate(zip(*column_values), start=1):
+                ws.write_row(row_idx, 0, row)
+
+        workbook.close()
+
+    except ImportError:
+        # Fallback: buffer the workbook with openpyxl
+        with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
+            for sheet_name, df in sheets.items():
+                df.to_excel(writer, sheet_name=sheet_name, index=False)
+
 
 def load_property_data(filepath):
-    """Load property price data with proper column names."""
+    """Load property price data with proper column names.
+
+    Only latest-month, status 'A', D/F/S/T rows are materialised; the
+    filters run inside the Arrow scan rather than afterwards. Returns the
+    filtered DataFrame and a summary of the rows seen at each scan stage.
+    """
 
     # Define column names based on Land Registry specification
     columns = [
@@ -30,80 +79,110 @@ def load_property_data(filepath):
         'Record_Status'
     ]
 
-    df = pd.read_csv(filepath, header=None, names=columns)
-    return df
-
-
-def process_property_data(df):
-    """Process property price data according to Task 4 requirements."""
+    # Low-cardinality code columns are dictionary-encoded so filters compare integer codes
+    code_columns = ['Property_Type', 'Old_New', 'Duration', 'PPD_Category', 'Record_Status']
+    column_types = {col: pa.dictionary(pa.int32(), pa.string()) for col in code_columns}
+    column_types['Date'] = pa.timestamp('s')
+
+    csv_format = ds.CsvFileFormat(
+        read_options=csv.ReadOptions(column_names=columns, block_size=64 << 20),
+        convert_options=csv.ConvertOptions(
+            column_types=column_types,
+            timestamp_parsers=[DATE_FORMAT]
+        )
+    )
+    dataset = ds.dataset(filepath, format=csv_format)
+
+    # First pass streams only the Date column: row count, date range and latest month
+    total_rows = 0
+    first_date = None
+    latest_date = None
+    for batch in dataset.to_batches(columns=['Date'], batch_size=BATCH_SIZE):
+        total_rows += batch.num_rows
+        batch_range = pc.min_max(batch.column('Date')).as_py()
+        if batch_range['min'] is not None and (first_date is None or batch_range['min'] < first_date):
+            first_date = batch_range['min']
+        if batch_range['max'] is not None and (latest_date is None or batch_range['max'] > latest_date):
+            latest_date = batch_range['max']
+    first_of_latest_month = datetime(latest_date.year, latest_date.month, 1)
+
+    # Second pass reads only the latest month and applies the status and property type
+    # filters batch by batch, so peak memory follows one month of sales, not the whole file
+    month_filter = ds.field('Date') >= pa.scalar(first_of_latest_month, type=pa.timestamp('s'))
+    valid_property_types = pa.array(['D', 'F', 'S', 'T'])
+    month_rows = 0
+    status_rows = 0
+    status_counts = {}
+    batches = []
+    for batch in dataset.to_batches(filter=month_filter, batch_size=BATCH_SIZE):
+        month_rows += batch.num_rows
+        for item in pc.value_counts(batch.column('Record_Status')).to_pylist():
+            status_counts[item['values']] = status_counts.get(item['values'], 0) + item['counts']
+
+        batch = batch.filter(pc.equal(batch.column('Record_Status'), 'A'))
+        status_rows += batch.num_rows
+        batch = batch.filter(pc.is_in(batch.column('Property_Type'), value_set=valid_property_types))
+        if batch.num_rows > 0:
+            batches.append(batch)
+
+    df = pa.Table.from_batches(batches, schema=dataset.schema).to_pandas()
+
+    status_counts = pd.Series(status_counts, name='count').rename_axis('Record_Status')
+    scan_summary = {
+        'total_rows': total_rows,
+        'first_date': first_date,
+        'latest_date': latest_date,
+        'month_rows': month_rows,
+        'status_counts': status_counts.sort_values(ascending=False),
+        'status_rows': status_rows,
+        'type_rows': len(df)
+    }
+    return df, scan_summary
+
+
+def process_property_data(df, scan_summary):
+    """Report the Task 4 filtering steps for the rows kept by load_property_data.
+
+    The date, status and property type filters run inside the Arrow scan,
+    so this step only prints the counts recorded there and the property
+    type distribution of the rows that survived.
+    """
 
     print("=== Initial Data Info ===")
-    print(f"Total records: {len(df)}")
-    print(f"\nDate range: {df['Date'].min()} to {df['Date'].max()}")
-
-    # Convert Date column to datetime (handles various formats)
-    df['Date'] = pd.to_datetime(df['Date'], format='mixed', dayfirst=False)
-
-    # Sort by Date
-    df = df.sort_values('Date', ascending=True)
+    print(f"Total records: {scan_summary['total_rows']}")
+    print(f"\nDate range: {scan_summary['first_date']:{DATE_FORMAT}} to {scan_summary['latest_date']:{DATE_FORMAT}}")
 
-    # Find the latest complete month
-    latest_date = df['Date'].max()
+    # Latest month in the data, assumed complete
+    latest_date = pd.Timestamp(scan_summary['latest_date'])
     print(f"\nLatest date in data: {latest_date}")
 
-    # Get the last complete month (month before the latest month if latest is incomplete)
-    # Check if we have transactions throughout the latest month
-    latest_year = latest_date.year
-    latest_month = latest_date.month
+    print(f"\nFiltered to latest complete month: {latest_date.year}-{latest_date.month:02d}")
+    print(f"Records after date filter: {scan_summary['month_rows']}")
 
-    # Filter for the latest complete month
-    # Assuming the latest month in the data is complete
-    df_filtered = df[(df['Date'].dt.year == latest_year) &
-                     (df['Date'].dt.month == latest_month)]
-
-    print(f"\nFiltered to latest complete month: {latest_year}-{latest_month:02d}")
-    print(f"Records after date filter: {len(df_filtered)}")
-
-    # Check Record_Status column
+    # Record_Status counts over the whole month, as seen by the scan
     print(f"\nRecord Status counts:")
-    print(df_filtered['Record_Status'].value_counts())
-
-    # Keep only 'A' records
-    df_filtered = df_filtered[df_filtered['Record_Status'] == 'A']
-    print(f"Records after removing C/D status: {len(df_filtered)}")
+    print(scan_summary['status_counts'])
 
-    # Filter for property types D, F, S, T only (exclude O)
-    valid_property_types = ['D', 'F', 'S', 'T']
-    df_filtered = df_filtered[df_filtered['Property_Type'].isin(valid_property_types)]
-    print(f"Records after filtering property types (D, F, S, T): {len(df_filtered)}")
+    print(f"Records after removing C/D status: {scan_summary['status_rows']}")
+    print(f"Records after filtering property types (D, F, S, T): {scan_summary['type_rows']}")
 
     print(f"\nProperty Type distribution:")
-    print(df_filtered['Property_Type'].value_counts())
+    print(df['Property_Type'].cat.remove_unused_categories().value_counts())
 
-    return df_filtered
+    return df
 
 
 def create_pivot_by_district(df):
     """Create pivot table counting transactions by District and Property Type."""
 
-    # Create pivot table
-    pivot = pd.pivot_table(
-        df,
-        values='Transaction_ID',
-        index='District',
-        columns='Property_Type',
-        aggfunc='count',
-        fill_value=0
+    # Count transactions per District and Property Type (groupby avoids pivot_table's dense reshape)
+    pivot = (
+        df.groupby(['District', 'Property_Type'], observed=True)
+        .size()
+        .unstack(fill_value=0)
+        .reindex(columns=['D', 'F', 'S', 'T'], fill_value=0)
     )
 
-    # Ensure all property types are present
-    for prop_type in ['D', 'F', 'S', 'T']:
-        if prop_type not in pivot.columns:
-            pivot[prop_type] = 0
-
-    # Reorder columns
-    pivot = pivot[['D', 'F', 'S', 'T']]
-
     # Add total column
     pivot['Total'] = pivot.sum(axis=1)
 
@@ -118,19 +197,34 @@ def create_pivot_by_district(df):
     return pivot
 
 
+def clean_names(names):
+    """Trim and upper-case names in one pass of Arrow string kernels."""
+
+    cleaned = pc.utf8_upper(pc.utf8_trim_whitespace(pa.array(names)))
+    return cleaned.to_pandas().set_axis(names.index)
+
+
 def match_with_lookup(pivot_df, lookup_df):
     """Match district pivot with lookup table and handle mismatches."""
 
-    # Clean district names for matching
-    pivot_df['District_Clean'] = pivot_df['District'].str.strip().str.upper()
-    lookup_df['LAD_Name_Clean'] = lookup_df['LAD_Name'].str.strip().str.upper()
-
-    # Merge with lookup
-    merged = pivot_df.merge(
-        lookup_df[['LAD_Name', 'LAD_Name_Clean', 'Region_Code', 'Region_Name']],
-        left_on='District_Clean',
-        right_on='LAD_Name_Clean',
-        how='left'
+    # Clean district names and factorize both sides into one shared set of integer keys
+    district_names = clean_names(pivot_df['District'])
+    lad_names = clean_names(lookup_df['LAD_Name'])
+    keys, _ = pd.factorize(pd.concat([district_names, lad_names], ignore_index=True))
+    # Keys live on local copies so the caller's frames (written out later) stay untouched
+    districts = pivot_df.assign(District_Key=keys[:len(pivot_df)])
+    lookup = lookup_df[['LAD_Name', 'Region_Code', 'Region_Name']].assign(LAD_Key=keys[len(pivot_df):])
+
+    # One lookup row per LAD keeps the left join many-to-one (no row fan-out)
+    lookup_unique = lookup.drop_duplicates('LAD_Key')
+
+    # Merge with lookup on the integer keys
+    merged = districts.merge(
+        lookup_unique,
+        left_on='District_Key',
+        right_on='LAD_Key',
+        how='left',
+        validate='many_to_one'
     )
 
     # Check for unmatched districts
@@ -163,13 +257,9 @@ def match_with_lookup(pivot_df, lookup_df):
 def create_regional_summary(district_df):
     """Create regional summary by summing property types."""
 
-    regional_summary = district_df.groupby(['Region_Code', 'Region_Name']).agg({
-        'D': 'sum',
-        'F': 'sum',
-        'S': 'sum',
-        'T': 'sum',
-        'Total': 'sum'
-    }).reset_index()
+    regional_summary = district_df.groupby(['Region_Code', 'Region_Name'], observed=True, as_index=False)[
+        ['D', 'F', 'S', 'T', 'Total']
+    ].sum()
 
     print("\n=== Regional Summary ===")
     print(regional_summary)
@@ -186,18 +276,18 @@ def main():
 
     # Load property price data
     print("\nLoading property price data...")
-    property_df = load_property_data('module_1/week_8/pp-monthly-update-new-version.csv')
+    property_df, scan_summary = load_property_data('module_1/week_8/pp-monthly-update-new-version.csv')
 
     # Process data (filter by date, status, property type)
     print("\nProcessing data...")
-    processed_df = process_property_data(property_df)
+    processed_df = process_property_data(property_df, scan_summary)
 
     # Create pivot table by district and property type
     print("\nCreating pivot table...")
     pivot_district = create_pivot_by_district(processed_df)
 
     # Save pivot table
-    pivot_district.to_csv('module_1/week_8/task_4_district_property_counts.csv', index=False)
+    write_csv(pivot_district, 'module_1/week_8/task_4_district_property_counts.csv')
     print("\n✓ Pivot table saved to: module_1/week_8/task_4_district_property_counts.csv")
 
     # Load lookup data (from Task 3 output)
@@ -210,7 +300,7 @@ def main():
         matched_df = match_with_lookup(pivot_district, lookup_df)
 
         # Save matched data
-        matched_df.to_csv('module_1/week_8/task_4_district_property_counts_matched.csv', index=False)
+        write_csv(matched_df, 'module_1/week_8/task_4_district_property_counts_matched.csv')
         print("\n✓ Matched data saved to: module_1/week_8/task_4_district_property_counts_matched.csv")
 
         # Create regional summary
@@ -218,15 +308,17 @@ def main():
         regional_df = create_regional_summary(matched_df)
 
         # Save regional summary
-        regional_df.to_csv('module_1/week_8/task_4_regional_property_summary.csv', index=False)
+        write_csv(regional_df, 'module_1/week_8/task_4_regional_property_summary.csv')
+        write_parquet(regional_df, 'module_1/week_8/task_4_regional_property_summary.csv')
         print("\n✓ Regional summary saved to: module_1/week_8/task_4_regional_property_summary.csv")
 
         # Create Excel file with multiple sheets
         print("\nCreating Excel output file...")
-        with pd.ExcelWriter('module_1/week_8/property_analysis_output.xlsx', engine='openpyxl') as writer:
-            pivot_district.to_excel(writer, sheet_name='District_Pivot', index=False)
-            matched_df.to_excel(writer, sheet_name='District_Matched', index=False)
-            regional_df.to_excel(writer, sheet_name='Regional_Summary', index=False)
+        write_excel_sheets('module_1/week_8/property_analysis_output.xlsx', {
+            'District_Pivot': pivot_district,
+            'District_Matched': matched_df,
+            'Regional_Summary': regional_df
+        })
 
         print("\n✓ Excel file saved to: property_analysis_output.xlsx")
 
@@ -2,8 +2,70 @@ import pandas as pd
 import numpy as np
 import warnings
 
+try:
+    from .table_io import read_table, write_csv
+except ImportError:
+    # Run as a plain script (python path/to/task_5.py): import the sibling module directly
+    from table_io import read_table, write_csv
+
+try:
+    from numba import njit
+except ImportError:
+    # Fallback: run the kernel as plain Python when numba is not installed
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
 warnings.filterwarnings('ignore')
 
+# Sales counts fed to the share kernel; Total_Sales must stay last
+SALES_COLUMNS = ['Sales_Detached', 'Sales_Flats', 'Sales_Semi', 'Sales_Terraced', 'Total_Sales']
+PCT_COLUMNS = ['Pct_Detached', 'Pct_Flats', 'Pct_Semi', 'Pct_Terraced', 'Sales_Rate']
+
+
+@njit(cache=True)
+def sales_share_kernel(sales, dwellings):
+    """Compute per-region and national sales shares in one fused loop.
+
+    Returns an (n + 1, 5) percentage matrix whose last row is the national
+    figure, and the national totals of the sales columns followed by dwellings.
+    """
+
+    n_rows, n_cols = sales.shape
+    totals = np.zeros(n_cols + 1)
+    pct = np.zeros((n_rows + 1, n_cols))
+
+    for i in range(n_rows + 1):
+        if i < n_rows:
+            row = sales[i]
+            row_dwellings = dwellings[i]
+            for j in range(n_cols):
+                totals[j] += row[j]
+            totals[n_cols] += row_dwellings
+        else:
+            row = totals[:n_cols]
+            row_dwellings = totals[n_cols]
+
+        # Property types are shares of total sales; Sales_Rate is a share of dwellings
+        row_sales = row[n_cols - 1]
+        if row_sales > 0:
+            for j in range(n_cols - 1):
+                pct[i, j] = row[j] / row_sales * 100
+        if row_dwellings > 0:
+            pct[i, n_cols - 1] = row_sales / row_dwellings * 100
+
+    return pct, totals
+
+
+def compute_sales_shares(df):
+    """Run the share kernel on plain NumPy arrays extracted from the DataFrame."""
+
+    sales = df[SALES_COLUMNS].to_numpy(dtype=np.float64)
+    dwellings = np.nan_to_num(df['Total_Dwellings'].to_numpy(dtype=np.float64))
+    pct, totals = sales_share_kernel(sales, dwellings)
+    return pct.round(2), totals
+
 
 def load_data():
     """Load dwelling and sales data."""
@@ -11,10 +73,10 @@ def load_data():
     print("Loading data files...")
 
     # Load regional dwelling data from Task 3
-    dwellings_df = pd.read_csv('census_dwelling_regional_summary.csv')
+    dwellings_df = read_table('census_dwelling_regional_summary.csv')
 
     # Load regional property sales from Task 4
-    sales_df = pd.read_csv('task_4_regional_property_summary.csv')
+    sales_df = read_table('task_4_regional_property_summary.csv')
 
     print(f"✓ Dwelling data loaded: {len(dwellings_df)} regions")
     print(f"✓ Sales data loaded: {len(sales_df)} regions")
@@ -25,19 +87,32 @@ def load_data():
 def merge_datasets(dwellings_df, sales_df):
     """Merge dwelling and sales data by region."""
 
-    # Merge on Region_Code and Region_Name
-    merged = dwellings_df.merge(
-        sales_df,
-        on=['Region_Code', 'Region_Name'],
+    # Share one categorical dtype for Region_Code so the merge compares integer codes
+    region_codes = pd.CategoricalDtype(sorted(
+        set(dwellings_df['Region_Code']) | set(sales_df['Region_Code'])
+    ))
+    dwellings_df = dwellings_df.astype({'Region_Code': region_codes})
+    sales_df = sales_df.astype({'Region_Code': region_codes})
+
+    # Region_Code alone identifies a region, so merge on it and map names back afterwards
+    name_cols = ['Region_Code', 'Region_Name']
+    region_names = pd.concat([sales_df[name_cols], dwellings_df[name_cols]]).drop_duplicates('Region_Code', keep='last')
+    region_names = dict(zip(region_names['Region_Code'], region_names['Region_Name']))
+
+    merged = dwellings_df.drop(columns='Region_Name').merge(
+        sales_df.drop(columns='Region_Name'),
+        on='Region_Code',
         how='outer',
         suffixes=('_Dwellings', '_Sales')
     )
 
+    # Back to plain strings so the national row can be added later
+    merged['Region_Code'] = merged['Region_Code'].astype(str)
+    merged.insert(1, 'Region_Name', merged['Region_Code'].map(region_names))
+
     # Fill NaN values with 0 for sales (regions with no sales)
-    sales_cols = ['D', 'F', 'S', 'T', 'Total']
-    for col in sales_cols:
-        if col in merged.columns:
-            merged[col] = merged[col].fillna(0).astype(int)
+    sales_cols = [col for col in ['D', 'F', 'S', 'T', 'Total'] if col in merged.columns]
+    merged[sales_cols] = merged[sales_cols].fillna(0).to_numpy(dtype=np.int64)
 
     print(f"\n=== Merged Regional Data ===")
     print(merged[['Region_Name', 'Total_Dwellings', 'Total']])
@@ -46,7 +121,11 @@ def merge_datasets(dwellings_df, sales_df):
 
 
 def calculate_percentages(merged_df):
-    """Calculate percentage of each property type sold by region and nationally."""
+    """Calculate percentage of each property type sold by region and nationally.
+
+    Returns the regional frame and the national (percentages, totals) pair
+    from the same kernel pass, for calculate_national_totals.
+    """
 
     # Rename sales columns for clarity
     merged_df = merged_df.rename(columns={
@@ -57,62 +136,54 @@ def calculate_percentages(merged_df):
         'Total': 'Total_Sales'
     })
 
-    # Calculate percentages for each property type by region
-    merged_df['Pct_Detached'] = (merged_df['Sales_Detached'] / merged_df['Total_Sales'] * 100).round(2)
-    merged_df['Pct_Flats'] = (merged_df['Sales_Flats'] / merged_df['Total_Sales'] * 100).round(2)
-    merged_df['Pct_Semi'] = (merged_df['Sales_Semi'] / merged_df['Total_Sales'] * 100).round(2)
-    merged_df['Pct_Terraced'] = (merged_df['Sales_Terraced'] / merged_df['Total_Sales'] * 100).round(2)
-
-    # Calculate sales as percentage of total dwellings
-    merged_df['Sales_Rate'] = (merged_df['Total_Sales'] / merged_df['Total_Dwellings'] * 100).round(2)
-
-    # Handle division by zero (regions with no sales)
-    merged_df['Pct_Detached'] = merged_df['Pct_Detached'].fillna(0)
-    merged_df['Pct_Flats'] = merged_df['Pct_Flats'].fillna(0)
-    merged_df['Pct_Semi'] = merged_df['Pct_Semi'].fillna(0)
-    merged_df['Pct_Terraced'] = merged_df['Pct_Terraced'].fillna(0)
-    merged_df['Sales_Rate'] = merged_df['Sales_Rate'].fillna(0)
+    # Calculate percentages for each property type by region (last kernel row is national)
+    pct, totals = compute_sales_shares(merged_df)
+    merged_df[PCT_COLUMNS] = pct[:-1]
 
-    return merged_df
+    return merged_df, (pct[-1], totals)
 
 
-def calculate_national_totals(merged_df):
+def calculate_national_totals(merged_df, national_shares):
     """Calculate national totals and percentages for England and Wales."""
 
-    # Sum all regions to get national totals
-    national = pd.DataFrame({
-        'Region_Code': ['NATIONAL'],
-        'Region_Name': ['England & Wales'],
-        'Total_Dwellings': [merged_df['Total_Dwellings'].sum()],
-        'Unshared_Dwellings': [merged_df['Unshared_Dwellings'].sum()],
-        'Shared_Dwellings': [merged_df['Shared_Dwellings'].sum()],
-        'Sales_Detached': [merged_df['Sales_Detached'].sum()],
-        'Sales_Flats': [merged_df['Sales_Flats'].sum()],
-        'Sales_Semi': [merged_df['Sales_Semi'].sum()],
-        'Sales_Terraced': [merged_df['Sales_Terraced'].sum()],
-        'Total_Sales': [merged_df['Total_Sales'].sum()]
-    })
-
-    # Calculate national percentages
-    total_sales = national['Total_Sales'].iloc[0]
-    national['Pct_Detached'] = (national['Sales_Detached'] / total_sales * 100).round(2)
-    national['Pct_Flats'] = (national['Sales_Flats'] / total_sales * 100).round(2)
-    national['Pct_Semi'] = (national['Sales_Semi'] / total_sales * 100).round(2)
-    national['Pct_Terraced'] = (national['Sales_Terraced'] / total_sales * 100).round(2)
-    national['Sales_Rate'] = (national['Total_Sales'] / national['Total_Dwellings'] * 100).round(2)
-
-    # Combine regional and national data
-    combined = pd.concat([merged_df, national], ignore_index=True)
+    # National percentages and totals come from the kernel pass in calculate_percentages
+    national_pct, totals = national_shares
+    national_sales = totals[:-1].astype(np.int64)
+    unshared, shared = np.nansum(merged_df[['Unshared_Dwellings', 'Shared_Dwellings']].to_numpy(), axis=0)
+
+    national = {
+        'Region_Code': 'NATIONAL',
+        'Region_Name': 'England & Wales',
+        'Total_Dwellings': np.int64(totals[-1]),
+        'Unshared_Dwellings': unshared,
+        'Shared_Dwellings': shared,
+        **dict(zip(SALES_COLUMNS, national_sales)),
+        **dict(zip(PCT_COLUMNS, national_pct))
+    }
+
+    # Combine regional and national data: reindex adds an empty row (one copy of the frame)
+    # and the national values are written into it
+    combined = merged_df.reindex(range(len(merged_df) + 1))
+    national_cols = list(national)
+    combined.iloc[-1, combined.columns.get_indexer(national_cols)] = list(national.values())
+
+    # Only columns the empty row upcast (e.g. int64 -> float64) need their dtype restored
+    upcast = {
+        col: merged_df[col].dtype for col in national_cols
+        if combined[col].dtype != merged_df[col].dtype
+    }
+    if upcast:
+        combined = combined.astype(upcast)
 
     print("\n=== National Summary ===")
-    print(f"Total Dwellings: {national['Total_Dwellings'].iloc[0]:,}")
-    print(f"Total Sales: {national['Total_Sales'].iloc[0]:,}")
-    print(f"National Sales Rate: {national['Sales_Rate'].iloc[0]}%")
+    print(f"Total Dwellings: {national['Total_Dwellings']:,}")
+    print(f"Total Sales: {national['Total_Sales']:,}")
+    print(f"National Sales Rate: {national['Sales_Rate']}%")
     print(f"\nNational Property Type Distribution:")
-    print(f"  Detached: {national['Pct_Detached'].iloc[0]}%")
-    print(f"  Flats: {national['Pct_Flats'].iloc[0]}%")
-    print(f"  Semi-detached: {national['Pct_Semi'].iloc[0]}%")
-    print(f"  Terraced: {national['Pct_Terraced'].iloc[0]}%")
+    print(f"  Detached: {national['Pct_Detached']}%")
+    print(f"  Flats: {national['Pct_Flats']}%")
+    print(f"  Semi-detached: {national['Pct_Semi']}%")
+    print(f"  Terraced: {national['Pct_Terraced']}%")
 
     return combined
 
@@ -120,33 +191,32 @@ def calculate_national_totals(merged_df):
 def identify_maxima(df):
     """Identify and flag maximum values for each metric."""
 
-    # Exclude national row for maxima calculation
-    regional_only = df[df['Region_Code'] != 'NATIONAL'].copy()
-
-    # Find maxima for each percentage column
-    max_detached = regional_only['Pct_Detached'].max()
-    max_flats = regional_only['Pct_Flats'].max()
-    max_semi = regional_only['Pct_Semi'].max()
-    max_terraced = regional_only['Pct_Terraced'].max()
-    max_sales_rate = regional_only['Sales_Rate'].max()
-
-    # Create flags for maxima
-    df['Max_Detached'] = df['Pct_Detached'] == max_detached
-    df['Max_Flats'] = df['Pct_Flats'] == max_flats
-    df['Max_Semi'] = df['Pct_Semi'] == max_semi
-    df['Max_Terraced'] = df['Pct_Terraced'] == max_terraced
-    df['Max_Sales_Rate'] = df['Sales_Rate'] == max_sales_rate
+    # Metric column -> (flag column, label used in the printed summary)
+    metrics = {
+        'Pct_Detached': ('Max_Detached', 'Highest % Detached'),
+        'Pct_Flats': ('Max_Flats', 'Highest % Flats'),
+        'Pct_Semi': ('Max_Semi', 'Highest % Semi-detached'),
+        'Pct_Terraced': ('Max_Terraced', 'Highest % Terraced'),
+        'Sales_Rate': ('Max_Sales_Rate', 'Highest Sales Rate')
+    }
+
+    # Work on one (n, 5) NumPy block; the national row is excluded from the maxima
+    values = df[list(metrics)].to_numpy(dtype=np.float64)
+    regional = (df['Region_Code'] != 'NATIONAL').to_numpy()
+    regional_values = values[regional]
+
+    # One argmax per column gives both the maximum and the region holding it
+    max_pos = regional_values.argmax(axis=0)
+    max_values = regional_values[max_pos, np.arange(len(metrics))]
+    max_regions = df['Region_Name'].to_numpy()[regional][max_pos]
+
+    # Flag every row equal to its column maximum (ties included) in one 2-D comparison
+    flag_cols = [flag_col for flag_col, _ in metrics.values()]
+    df[flag_cols] = values == max_values
 
     print("\n=== Regional Maxima ===")
-    print(
-        f"Highest % Detached: {regional_only.loc[regional_only['Pct_Detached'].idxmax(), 'Region_Name']} ({max_detached}%)")
-    print(f"Highest % Flats: {regional_only.loc[regional_only['Pct_Flats'].idxmax(), 'Region_Name']} ({max_flats}%)")
-    print(
-        f"Highest % Semi-detached: {regional_only.loc[regional_only['Pct_Semi'].idxmax(), 'Region_Name']} ({max_semi}%)")
-    print(
-        f"Highest % Terraced: {regional_only.loc[regional_only['Pct_Terraced'].idxmax(), 'Region_Name']} ({max_terraced}%)")
-    print(
-        f"Highest Sales Rate: {regional_only.loc[regional_only['Sales_Rate'].idxmax(), 'Region_Name']} ({max_sales_rate}%)")
+    for (_, label), region, value in zip(metrics.values(), max_regions, max_values):
+        print(f"{label}: {region} ({value}%)")
 
     return df
 
@@ -183,91 +253,66 @@ def save_to_excel_with_formatting(df, filename):
     """Save to Excel with conditional formatting highlighting maxima."""
 
     try:
-        from openpyxl import load_workbook
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
         from openpyxl.styles import PatternFill, Font
+        from openpyxl.utils import get_column_letter
 
-        # Save to Excel
-        df.to_excel(filename, index=False, sheet_name='Regional Analysis')
-
-        # Load workbook for formatting
-        wb = load_workbook(filename)
-        ws = wb['Regional Analysis']
+        # Stream rows straight to disk; cells are styled as they are written
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet('Regional Analysis')
 
         # Define highlight fill
         highlight_fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
         bold_font = Font(bold=True)
 
-        # Find column indices for percentage columns
-        pct_cols = {
-            'Pct_Detached': None,
-            'Pct_Flats': None,
-            'Pct_Semi': None,
-            'Pct_Terraced': None,
-            'Sales_Rate': None
+        # Percentage column -> Max flag column that controls its highlighting
+        highlight_cols = {
+            'Pct_Detached': 'Max_Detached',
+            'Pct_Flats': 'Max_Flats',
+            'Pct_Semi': 'Max_Semi',
+            'Pct_Terraced': 'Max_Terraced',
+            'Sales_Rate': 'Max_Sales_Rate'
         }
-
-        max_cols = {
-            'Max_Detached': None,
-            'Max_Flats': None,
-            'Max_Semi': None,
-            'Max_Terraced': None,
-            'Max_Sales_Rate': None
+        columns = df.columns.tolist()
+        flag_positions = {
+            columns.index(pct_col): columns.index(max_col)
+            for pct_col, max_col in highlight_cols.items()
         }
 
-        # Get column indices
-        for idx, cell in enumerate(ws[1], start=1):
-            if cell.value in pct_cols:
-                pct_cols[cell.value] = idx
-            if cell.value in max_cols:
-                max_cols[cell.value] = idx
-
-        # Apply highlighting based on Max flags
-        for row_idx in range(2, ws.max_row + 1):
-            # Detached
-            if ws.cell(row_idx, max_cols['Max_Detached']).value == True:
-                ws.cell(row_idx, pct_cols['Pct_Detached']).fill = highlight_fill
-                ws.cell(row_idx, pct_cols['Pct_Detached']).font = bold_font
-
-            # Flats
-            if ws.cell(row_idx, max_cols['Max_Flats']).value == True:
-                ws.cell(row_idx, pct_cols['Pct_Flats']).fill = highlight_fill
-                ws.cell(row_idx, pct_cols['Pct_Flats']).font = bold_font
-
-            # Semi
-            if ws.cell(row_idx, max_cols['Max_Semi']).value == True:
-                ws.cell(row_idx, pct_cols['Pct_Semi']).fill = highlight_fill
-                ws.cell(row_idx, pct_cols['Pct_Semi']).font = bold_font
-
-            # Terraced
-            if ws.cell(row_idx, max_cols['Max_Terraced']).value == True:
-                ws.cell(row_idx, pct_cols['Pct_Terraced']).fill = highlight_fill
-                ws.cell(row_idx, pct_cols['Pct_Terraced']).font = bold_font
-
-            # Sales Rate
-            if ws.cell(row_idx, max_cols['Max_Sales_Rate']).value == True:
-                ws.cell(row_idx, pct_cols['Sales_Rate']).fill = highlight_fill
-                ws.cell(row_idx, pct_cols['Sales_Rate']).font = bold_font
+        # Auto-adjust column widths from vectorised string lengths (write-only sheets need
+        # dimensions before any rows); all-missing columns fall back to the header width
+        value_lengths = df.astype(str).apply(lambda col: col.str.len().max()).fillna(0).to_numpy()
+        header_lengths = df.columns.str.len().to_numpy()
+        for col_idx, width in enumerate(np.maximum(value_lengths, header_lengths), start=1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = min(width + 2, 50)
 
         # Hide the Max columns
-        for col_letter in ['N', 'O', 'P', 'Q', 'R']:
-            ws.column_dimensions[col_letter].hidden = True
+        for max_col in highlight_cols.values():
+            ws.column_dimensions[get_column_letter(columns.index(max_col) + 1)].hidden = True
 
         # Make header bold
-        for cell in ws[1]:
+        header = []
+        for name in columns:
+            cell = WriteOnlyCell(ws, value=name)
             cell.font = bold_font
-
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
+            header.append(cell)
+        ws.append(header)
+
+        # Missing values become blank cells, as DataFrame.to_excel writes them
+        column_values = [df[col].astype(object).where(df[col].notna(), None).tolist() for col in columns]
+
+        # Apply highlighting based on Max flags while writing each row
+        for values in zip(*column_values):
+            row = []
+            for col_idx, value in enumerate(values):
+                cell = WriteOnlyCell(ws, value=value)
+                flag_idx = flag_positions.get(col_idx)
+                if flag_idx is not None and values[flag_idx]:
+                    cell.fill = highlight_fill
+                    cell.font = bold_font
+                row.append(cell)
+            ws.append(row)
 
         wb.save(filename)
         print(f"\n✓ Excel file with formatting saved to: {filename}")
@@ -294,11 +339,11 @@ def main():
 
     # Calculate percentages
     print("\nCalculating percentages...")
-    analysis_df = calculate_percentages(merged_df)
+    analysis_df, national_shares = calculate_percentages(merged_df)
 
     # Add national totals
     print("\nCalculating national totals...")
-    complete_df = calculate_national_totals(analysis_df)
+    complete_df = calculate_national_totals(analysis_df, national_shares)
 
     # Identify maxima
     print("\nIdentifying regional maxima...")
@@ -316,7 +361,7 @@ def main():
 
     # Save outputs
     print("\n\nSaving outputs...")
-    summary_table.to_csv('regional_analysis_complete.csv', index=False)
+    write_csv(summary_table, 'regional_analysis_complete.csv')
     print("✓ CSV saved to: regional_analysis_complete.csv")
 
     # Save to Excel with formatting